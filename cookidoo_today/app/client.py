@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import hashlib
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, TypeVar
+
+import aiohttp
+
+from cookidoo_api import Cookidoo
+from cookidoo_api.exceptions import CookidooAuthException
+from cookidoo_api.helpers import get_localization_options
+from cookidoo_api.types import CookidooAuthResponse, CookidooConfig, CookidooLocalization
+
+from .metrics import metrics
+from .utils import read_json, write_json_atomic
+
+T = TypeVar("T")
+
+# odświeżamy token trochę przed faktycznym wygaśnięciem
+TOKEN_EXPIRY_MARGIN_S = 300
+
+
+def _account_key(email: str, country: str) -> str:
+    # w pliku z tokenami nie trzymamy ani hasła, ani adresu e-mail
+    return hashlib.sha256(f"{email.lower()}|{country.lower()}".encode("utf-8")).hexdigest()
+
+
+def _auth_to_dict(auth: CookidooAuthResponse) -> dict[str, Any]:
+    if dataclasses.is_dataclass(auth):
+        return dataclasses.asdict(auth)
+    return dict(auth)
+
+
+class CookidooClient:
+    """Jedna sesja HTTP i jeden zalogowany klient Cookidoo na cały czas życia add-ona."""
+
+    def __init__(self, tokens_path: Path) -> None:
+        self.tokens_path = tokens_path
+        self.session: aiohttp.ClientSession | None = None
+        self.localization: CookidooLocalization | None = None
+        self._api: Cookidoo | None = None
+        self._account: str | None = None
+        self._expires_at = 0.0
+        self._localizations: dict[str, CookidooLocalization] = {}
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(trace_configs=[metrics.trace_config()])
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+        self.session = None
+        self._api = None
+
+    async def _resolve_localization(self, country: str) -> CookidooLocalization:
+        loc = self._localizations.get(country)
+        if loc is not None:
+            return loc
+        with metrics.phase("localization"):
+            locs = await get_localization_options(country=country)
+        if not locs:
+            raise RuntimeError(f"Brak lokalizacji dla country={country}")
+        loc = next((l for l in locs if l.language.lower().startswith("pl")), locs[0])
+        self._localizations[country] = loc
+        return loc
+
+    def _load_tokens(self, account: str) -> CookidooAuthResponse | None:
+        raw = read_json(self.tokens_path)
+        if not isinstance(raw, dict) or raw.get("account") != account:
+            return None
+        try:
+            auth = CookidooAuthResponse(**raw["auth"])
+        except (KeyError, TypeError):
+            return None
+        # wygasły access token też się przydaje - zostaje refresh_token
+        self._expires_at = float(raw.get("expires_at") or 0)
+        return auth
+
+    def _store_tokens(self, auth: CookidooAuthResponse) -> None:
+        data = _auth_to_dict(auth)
+        self._expires_at = time.time() + float(data.get("expires_in") or 0)
+        write_json_atomic(
+            self.tokens_path,
+            {"account": self._account, "expires_at": self._expires_at, "auth": data},
+        )
+
+    async def _login(self, api: Cookidoo) -> None:
+        with metrics.phase("login"):
+            auth = await api.login()
+        self._store_tokens(auth)
+
+    async def _reauthenticate(self, api: Cookidoo) -> None:
+        # najpierw refresh token, pełny login tylko gdy to się nie uda
+        if api.auth_data is not None:
+            try:
+                with metrics.phase("login"):
+                    auth = await api.refresh_token()
+                self._store_tokens(auth)
+                return
+            except CookidooAuthException:
+                pass
+        await self._login(api)
+
+    async def get_api(self, settings: Any) -> Cookidoo:
+        async with self._lock:
+            await self.start()
+            account = _account_key(settings.email, settings.country)
+            if self._api is not None and self._account != account:
+                # zmiana konta/kraju w opcjach -> nowy klient
+                self._api = None
+
+            if self._api is None:
+                loc = await self._resolve_localization(settings.country)
+                cfg = CookidooConfig(localization=loc, email=settings.email, password=settings.password)
+                api = Cookidoo(self.session, cfg)
+                self._account = account
+                self.localization = loc
+
+                auth = self._load_tokens(account)
+                if auth is not None:
+                    expired = self._expires_at - TOKEN_EXPIRY_MARGIN_S <= time.time()
+                    metrics.cache_event("auth_tokens", "expired" if expired else "hit")
+                    api.auth_data = auth
+                else:
+                    metrics.cache_event("auth_tokens", "miss")
+                    await self._login(api)
+                self._api = api
+
+            if self._expires_at - TOKEN_EXPIRY_MARGIN_S <= time.time():
+                await self._reauthenticate(self._api)
+
+            return self._api
+
+    async def call(self, settings: Any, fn: Callable[[Cookidoo], Awaitable[T]]) -> T:
+        api = await self.get_api(settings)
+        try:
+            return await fn(api)
+        except CookidooAuthException:
+            # 401 mimo ważnego (wg nas) tokenu - ponowne uwierzytelnienie i jedna powtórka
+            async with self._lock:
+                await self._reauthenticate(api)
+            return await fn(api)
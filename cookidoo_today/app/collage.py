@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+from .metrics import metrics
+from .utils import read_json, write_bytes_atomic, write_json_atomic
+
+TILE_W, TILE_H = 640, 480
+MAX_TILES = 4
+# zmiana układu/jakości -> nowa wersja, żeby stare kolaże się przebudowały
+LAYOUT_VERSION = 1
+
+
+def _open_scaled(path: Path, size: tuple[int, int]) -> Image.Image:
+    im = Image.open(path)
+    # JPEG: dekodowanie od razu w skali 1/2, 1/4 lub 1/8 (nie mniejszej niż size)
+    im.draft("RGB", size)
+    return im.convert("RGB")
+
+
+def make_collage(image_paths: list[Path], out_path: Path) -> None:
+    if not image_paths:
+        return
+
+    paths = image_paths[:MAX_TILES]
+
+    if len(paths) == 1:
+        canvas = _open_scaled(paths[0], (TILE_W * 2, TILE_H * 2))
+    else:
+        imgs = [_open_scaled(p, (TILE_W, TILE_H)).resize((TILE_W, TILE_H)) for p in paths]
+        if len(imgs) == 2:
+            canvas = Image.new("RGB", (TILE_W * 2, TILE_H))
+            canvas.paste(imgs[0], (0, 0))
+            canvas.paste(imgs[1], (TILE_W, 0))
+        else:
+            canvas = Image.new("RGB", (TILE_W * 2, TILE_H * 2))
+            canvas.paste(imgs[0], (0, 0))
+            canvas.paste(imgs[1], (TILE_W, 0))
+            canvas.paste(imgs[2], (0, TILE_H))
+            if len(imgs) >= 4:
+                canvas.paste(imgs[3], (TILE_W, TILE_H))
+
+    buf = io.BytesIO()
+    canvas.save(buf, "JPEG", quality=90)
+    # zapis atomowy - endpointy nigdy nie serwują połowy pliku
+    write_bytes_atomic(out_path, buf.getvalue())
+
+
+def collage_key(image_paths: list[Path]) -> str:
+    h = hashlib.sha256(f"v{LAYOUT_VERSION}".encode("utf-8"))
+    for p in image_paths[:MAX_TILES]:
+        try:
+            st = p.stat()
+        except OSError:
+            return ""
+        h.update(f"|{p.name}:{st.st_mtime_ns}:{st.st_size}".encode("utf-8"))
+    return h.hexdigest()
+
+
+class CollageRenderer:
+    """Renderuje kolaże poza pętlą asyncio i pomija te, których wejście się nie zmieniło."""
+
+    def __init__(self, index_path: Path, max_workers: int = 1) -> None:
+        self.index_path = index_path
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="collage")
+        raw = read_json(index_path, default={})
+        self._index: dict[str, str] = raw if isinstance(raw, dict) else {}
+        self._dirty = False
+
+    async def render(self, image_paths: list[Path], out_path: Path) -> bool:
+        if not image_paths:
+            return False
+        key = collage_key(image_paths)
+        if key and self._index.get(out_path.name) == key and out_path.exists():
+            metrics.cache_event("collage", "hit")
+            return False
+
+        metrics.cache_event("collage", "miss")
+        loop = asyncio.get_running_loop()
+        with metrics.phase("collage"):
+            await loop.run_in_executor(self._executor, make_collage, list(image_paths), out_path)
+        self._index[out_path.name] = key
+        self._dirty = True
+        return True
+
+    def forget(self, out_path: Path) -> None:
+        if self._index.pop(out_path.name, None) is not None:
+            self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        write_json_atomic(self.index_path, self._index)
+        self._dirty = False
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+
+import aiohttp
+from PIL import Image
+
+from .metrics import metrics
+
+CHUNK_SIZE = 64 * 1024
+PART_SUFFIX = ".part"
+
+
+class DownloadError(Exception):
+    pass
+
+
+def is_valid_jpeg(path: Path) -> bool:
+    try:
+        with Image.open(path) as im:
+            if im.format != "JPEG":
+                return False
+            # draft -> dekodowanie w skali 1/8, a i tak wykrywa ucięty plik
+            im.draft("RGB", (64, 64))
+            im.load()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return False
+    return True
+
+
+class Downloader:
+    """Pobieranie obrazków: strumieniowo do pliku tymczasowego, walidacja, atomowy rename.
+
+    Równoczesne pobrania do tej samej ścieżki (ten sam przepis w kilku dniach) są łączone.
+    """
+
+    def __init__(self) -> None:
+        self._pending: dict[Path, asyncio.Task] = {}
+        # pliki sprawdzone w tym uruchomieniu; nowe trafiają na miejsce dopiero po walidacji
+        self._verified: set[Path] = set()
+
+    def cleanup(self, directory: Path) -> None:
+        # resztki po przerwanych pobraniach
+        for p in directory.glob(f".*{PART_SUFFIX}"):
+            p.unlink(missing_ok=True)
+
+    def is_verified(self, path: Path) -> bool:
+        return path in self._verified and path.exists()
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str, out_path: Path) -> None:
+        # po powrocie (bez wyjątku) pod out_path leży sprawdzony JPEG
+        task = self._pending.get(out_path)
+        if task is None:
+            task = asyncio.create_task(self._fetch(session, url, out_path))
+            self._pending[out_path] = task
+            task.add_done_callback(lambda t, p=out_path: self._pending.pop(p, None))
+        await asyncio.shield(task)
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str, out_path: Path) -> None:
+        if self.is_verified(out_path):
+            metrics.cache_event("images", "hit")
+            return
+        if out_path.exists():
+            if await asyncio.to_thread(is_valid_jpeg, out_path):
+                metrics.cache_event("images", "hit")
+                self._verified.add(out_path)
+                return
+            # uszkodzony plik znika od razu - nieudane ponowne pobranie nie może go zostawić
+            out_path.unlink(missing_ok=True)
+        self._verified.discard(out_path)
+        metrics.cache_event("images", "miss")
+
+        # plik tymczasowy w tym samym katalogu -> os.replace jest atomowy
+        fd, tmp_name = tempfile.mkstemp(dir=out_path.parent, prefix=f".{out_path.name}.", suffix=PART_SUFFIX)
+        tmp = Path(tmp_name)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async with session.get(url) as r:
+                    r.raise_for_status()
+                    # przy Content-Encoding aiohttp rozpakowuje, a Content-Length dotyczy skompresowanych danych
+                    expected = None if r.headers.get("Content-Encoding") else r.content_length
+                    size = 0
+                    async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+                        await asyncio.to_thread(f.write, chunk)
+                        size += len(chunk)
+
+            if expected is not None and size != expected:
+                raise DownloadError(f"{url}: pobrano {size} z {expected} B")
+            if not await asyncio.to_thread(is_valid_jpeg, tmp):
+                raise DownloadError(f"{url}: niepoprawny JPEG")
+
+            os.replace(tmp, out_path)
+            self._verified.add(out_path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
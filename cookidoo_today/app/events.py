@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, AsyncIterator
+
+HEARTBEAT_S = 25.0
+RETRY_MS = 5000
+
+
+class Broadcaster:
+    """Fan-out najnowszego stanu do wielu subskrybentów SSE.
+
+    Trzymamy tylko ostatnie zdarzenie: klient wznawiający od starszej wersji dostaje
+    od razu aktualny stan, a pośrednie wersje są pomijane (i tak niczego nie wnoszą).
+    """
+
+    def __init__(self) -> None:
+        self.version = 0
+        self._data: dict[str, Any] = {}
+        self._changed = asyncio.Event()
+        self._closed = False
+        self.subscribers = 0
+
+    def set_initial(self, version: int, data: dict[str, Any]) -> None:
+        self.version = version
+        self._data = data
+
+    def publish(self, version: int, data: dict[str, Any]) -> None:
+        self.version = version
+        self._data = data
+        # każdy czekający subskrybent budzi się raz; nowe czekają na nowy Event
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def close(self) -> None:
+        self._closed = True
+        self._changed.set()
+
+    def _frame(self) -> bytes:
+        body = json.dumps({"version": self.version, **self._data}, separators=(",", ":"))
+        return f"id: {self.version}\nevent: update\ndata: {body}\n\n".encode("utf-8")
+
+    async def stream(self, since: int | None) -> AsyncIterator[bytes]:
+        self.subscribers += 1
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode("utf-8")
+            # wersja "z przyszłości" (np. po skasowaniu /data) -> traktujemy jak brak
+            sent = since if since is not None and since <= self.version else -1
+            while not self._closed:
+                if self.version > sent:
+                    sent = self.version
+                    yield self._frame()
+                    continue
+                changed = self._changed
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+        finally:
+            self.subscribers -= 1
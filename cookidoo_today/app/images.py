@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any
+
+from .utils import read_json, write_json_atomic
+
+DAY_COLLAGE_RE = re.compile(r"^day_(\d{4}-\d{2}-\d{2})\.jpg$")
+
+
+class ImageStore:
+    """Indeks /data/images: rozmiar, ostatni odczyt i ostatnie użycie w planie.
+
+    Pilnuje budżetu bajtów (LRU) i sprząta stare kolaże dzienne. Obrazki z bieżącego
+    planu nigdy nie są usuwane.
+    """
+
+    def __init__(self, directory: Path, index_path: Path, day_retention_days: int = 7) -> None:
+        self.directory = directory
+        self.index_path = index_path
+        self.day_retention_days = day_retention_days
+        self._lock = threading.Lock()
+        self._protected: set[str] = set()
+        raw = read_json(index_path, default={})
+        self._index: dict[str, dict[str, Any]] = raw if isinstance(raw, dict) else {}
+
+    def touch(self, name: str) -> None:
+        with self._lock:
+            entry = self._index.get(name)
+            if entry is not None:
+                entry["last_access"] = time.time()
+
+    def mark_referenced(self, names: set[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._protected = set(names)
+            for name in names:
+                self._index.setdefault(name, {"size": 0, "last_access": 0.0})["last_ref"] = now
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(int(e.get("size") or 0) for e in self._index.values())
+
+    async def collect(self, budget_bytes: int) -> list[str]:
+        # skan katalogu i unlinki poza pętlą asyncio
+        return await asyncio.to_thread(self._collect, budget_bytes)
+
+    def _sync_with_disk(self) -> None:
+        on_disk: dict[str, tuple[int, float]] = {}
+        for p in self.directory.iterdir():
+            if p.is_file() and p.suffix == ".jpg" and not p.name.startswith("."):
+                st = p.stat()
+                on_disk[p.name] = (st.st_size, st.st_mtime)
+
+        with self._lock:
+            for name in list(self._index):
+                if name not in on_disk:
+                    del self._index[name]
+            for name, (size, mtime) in on_disk.items():
+                entry = self._index.setdefault(name, {"last_access": mtime})
+                entry["size"] = size
+
+    def _remove(self, name: str) -> None:
+        (self.directory / name).unlink(missing_ok=True)
+        with self._lock:
+            self._index.pop(name, None)
+
+    def _collect(self, budget_bytes: int) -> list[str]:
+        self._sync_with_disk()
+        removed: list[str] = []
+
+        with self._lock:
+            protected = set(self._protected)
+            names = list(self._index)
+
+        # kolaże dni sprzed okna retencji, których nie ma już w planie
+        cutoff = (date.today() - timedelta(days=self.day_retention_days)).isoformat()
+        for name in names:
+            m = DAY_COLLAGE_RE.match(name)
+            if m and m.group(1) < cutoff and name not in protected:
+                self._remove(name)
+                removed.append(name)
+
+        with self._lock:
+            candidates = sorted(
+                (
+                    (max(e.get("last_access") or 0.0, e.get("last_ref") or 0.0), name, int(e.get("size") or 0))
+                    for name, e in self._index.items()
+                    if name not in protected
+                ),
+            )
+            total = sum(int(e.get("size") or 0) for e in self._index.values())
+
+        for _, name, size in candidates:
+            if total <= budget_bytes:
+                break
+            self._remove(name)
+            removed.append(name)
+            total -= size
+
+        with self._lock:
+            write_json_atomic(self.index_path, self._index)
+        return removed
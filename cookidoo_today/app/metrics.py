@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+import aiohttp
+
+# progi histogramu czasu odpowiedzi /api/* (sekundy)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# fazy bieżącego odświeżenia; ustawiane w zadaniu pętli odświeżania i dziedziczone przez
+# zadania, które ono tworzy - pobrania na żądanie (/api/week?offset, /api/range) go nie widzą
+_refresh_phases: ContextVar[Counter[str] | None] = ContextVar("cookidoo_refresh_phases", default=None)
+
+
+class RouteLatency:
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total_s += seconds
+        self.max_s = max(self.max_s, seconds)
+        for i, le in enumerate(LATENCY_BUCKETS):
+            if seconds <= le:
+                self.buckets[i] += 1
+
+
+class Metrics:
+    """Liczniki odświeżania i serwowania; eksport w formacie Prometheus i jako JSON."""
+
+    def __init__(self) -> None:
+        self.refreshes: Counter[str] = Counter()
+        self.last_success: float | None = None
+        self.last_error: str | None = None
+        self.last_error_at: float | None = None
+        self.last_duration_s: float | None = None
+        self.last_phases: dict[str, float] = {}
+        self.phase_totals: Counter[str] = Counter()
+        self.cache: Counter[tuple[str, str]] = Counter()
+        self.http: Counter[tuple[str, str]] = Counter()
+        self.routes: defaultdict[str, RouteLatency] = defaultdict(RouteLatency)
+        self._refresh_started: float | None = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        # czasy faz sumują się w obrębie jednego odświeżenia (np. scraping wielu dni)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            current = _refresh_phases.get()
+            if current is not None:
+                current[name] += dt
+            self.phase_totals[name] += dt
+
+    def cache_event(self, cache: str, result: str) -> None:
+        self.cache[(cache, result)] += 1
+
+    def begin_refresh(self) -> None:
+        _refresh_phases.set(Counter())
+        self._refresh_started = time.perf_counter()
+
+    def end_refresh(self, error: BaseException | None = None) -> None:
+        if self._refresh_started is not None:
+            self.last_duration_s = time.perf_counter() - self._refresh_started
+        self.last_phases = dict(_refresh_phases.get() or {})
+        _refresh_phases.set(None)
+        if error is None:
+            self.refreshes["ok"] += 1
+            self.last_success = time.time()
+        else:
+            self.refreshes["error"] += 1
+            self.last_error = repr(error)
+            self.last_error_at = time.time()
+
+    def last_success_age(self) -> float | None:
+        return None if self.last_success is None else time.time() - self.last_success
+
+    def observe_request(self, route: str, seconds: float) -> None:
+        self.routes[route].observe(seconds)
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        tc = aiohttp.TraceConfig()
+
+        async def on_request_end(session: Any, ctx: Any, params: aiohttp.TraceRequestEndParams) -> None:
+            self.http[(params.url.host or "", str(params.response.status))] += 1
+
+        async def on_request_exception(
+            session: Any, ctx: Any, params: aiohttp.TraceRequestExceptionParams
+        ) -> None:
+            self.http[(params.url.host or "", "error")] += 1
+
+        tc.on_request_end.append(on_request_end)
+        tc.on_request_exception.append(on_request_exception)
+        return tc
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "refreshes": dict(self.refreshes),
+            "last_success_age_s": _round(self.last_success_age()),
+            "last_refresh": {
+                "duration_s": _round(self.last_duration_s),
+                "phases_s": {k: _round(v) for k, v in sorted(self.last_phases.items())},
+            },
+            "last_error": self.last_error,
+            "last_error_age_s": _round(None if self.last_error_at is None else time.time() - self.last_error_at),
+            "cache": {f"{c}:{r}": n for (c, r), n in sorted(self.cache.items())},
+            "http": {f"{h}:{s}": n for (h, s), n in sorted(self.http.items())},
+            "routes": {
+                route: {
+                    "count": lat.count,
+                    "avg_ms": _round(lat.total_s / lat.count * 1000 if lat.count else None),
+                    "max_ms": _round(lat.max_s * 1000),
+                }
+                for route, lat in sorted(self.routes.items())
+            },
+        }
+
+    def prometheus(self, gauges: dict[str, float]) -> str:
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, samples: list[tuple[dict[str, str], float]]) -> None:
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {_num(value)}")
+
+        metric("cookidoo_refresh_total", "counter", [({"result": k}, v) for k, v in sorted(self.refreshes.items())])
+        if self.last_success is not None:
+            metric("cookidoo_refresh_last_success_timestamp_seconds", "gauge", [({}, self.last_success)])
+            metric("cookidoo_refresh_last_success_age_seconds", "gauge", [({}, self.last_success_age() or 0.0)])
+        if self.last_duration_s is not None:
+            metric("cookidoo_refresh_last_duration_seconds", "gauge", [({}, self.last_duration_s)])
+        metric(
+            "cookidoo_refresh_last_phase_seconds",
+            "gauge",
+            [({"phase": k}, v) for k, v in sorted(self.last_phases.items())],
+        )
+        metric(
+            "cookidoo_refresh_phase_seconds_total",
+            "counter",
+            [({"phase": k}, v) for k, v in sorted(self.phase_totals.items())],
+        )
+        metric(
+            "cookidoo_cache_events_total",
+            "counter",
+            [({"cache": c, "result": r}, n) for (c, r), n in sorted(self.cache.items())],
+        )
+        metric(
+            "cookidoo_http_responses_total",
+            "counter",
+            [({"host": h, "status": s}, n) for (h, s), n in sorted(self.http.items())],
+        )
+
+        lines.append("# TYPE cookidoo_api_request_duration_seconds histogram")
+        for route, lat in sorted(self.routes.items()):
+            for le, n in zip(LATENCY_BUCKETS, lat.buckets):
+                lines.append(
+                    f"cookidoo_api_request_duration_seconds_bucket{_labels({'route': route, 'le': _num(le)})} {n}"
+                )
+            lines.append(
+                f"cookidoo_api_request_duration_seconds_bucket{_labels({'route': route, 'le': '+Inf'})} {lat.count}"
+            )
+            lines.append(f"cookidoo_api_request_duration_seconds_sum{_labels({'route': route})} {_num(lat.total_s)}")
+            lines.append(f"cookidoo_api_request_duration_seconds_count{_labels({'route': route})} {lat.count}")
+
+        for name, value in sorted(gauges.items()):
+            metric(name, "gauge", [({}, value)])
+
+        return "\n".join(lines) + "\n"
+
+
+class LatencyMiddleware:
+    """Czysty middleware ASGI: czas obsługi żądań /api/* i /metrics per szablon ścieżki."""
+
+    def __init__(self, app: Any, exclude: set[str] | None = None) -> None:
+        self.app = app
+        self.exclude = exclude or set()
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # router wpisuje dopasowaną trasę do tego samego scope; szablon (np.
+            # /api/image/{recipe_id}.jpg) zamiast ścieżki, żeby nie mnożyć serii per id
+            path = getattr(scope.get("route"), "path", None)
+            if path and path not in self.exclude and (path.startswith("/api/") or path == "/metrics"):
+                metrics.observe_request(path, time.perf_counter() - t0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _round(value: float | None, digits: int = 4) -> float | None:
+    return None if value is None else round(value, digits)
+
+
+metrics = Metrics()
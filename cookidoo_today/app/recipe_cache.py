@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Any
+
+from .utils import read_json, write_json_atomic
+
+
+@dataclass
+class RecipeMeta:
+    photo_url: str | None = None
+    name: str | None = None
+    total_time: Any = None
+    etag: str | None = None
+    last_modified: str | None = None
+    checked_at: float = 0.0
+
+
+class RecipeCache:
+    """Trwały cache metadanych przepisów (recipe_id -> zdjęcie, nazwa, walidatory HTTP)."""
+
+    def __init__(self, path: Path, ttl_s: float, negative_ttl_s: float, retention_s: float) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        # strony bez zdjęcia sprawdzamy częściej niż te, które je mają
+        self.negative_ttl_s = negative_ttl_s
+        # wpisy niesprawdzane dłużej (przepis zniknął z planu) są usuwane
+        self.retention_s = retention_s
+        self._items: dict[str, RecipeMeta] = {}
+        self._dirty = False
+        self.load()
+
+    def load(self) -> None:
+        raw = read_json(self.path, default={})
+        if not isinstance(raw, dict):
+            raw = {}
+        names = {f.name for f in fields(RecipeMeta)}
+        self._items = {
+            rid: RecipeMeta(**{k: v for k, v in item.items() if k in names})
+            for rid, item in raw.items()
+            if isinstance(item, dict)
+        }
+        self._dirty = False
+        self.prune()
+
+    def prune(self, now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        stale = [rid for rid, m in self._items.items() if now - m.checked_at >= self.retention_s]
+        for rid in stale:
+            del self._items[rid]
+        if stale:
+            self._dirty = True
+
+    def save(self) -> None:
+        self.prune()
+        if not self._dirty:
+            return
+        write_json_atomic(self.path, {rid: asdict(m) for rid, m in self._items.items()})
+        self._dirty = False
+
+    def get(self, recipe_id: str) -> RecipeMeta | None:
+        return self._items.get(recipe_id)
+
+    def put(self, recipe_id: str, meta: RecipeMeta) -> None:
+        self._items[recipe_id] = meta
+        self._dirty = True
+
+    def is_fresh(self, meta: RecipeMeta, now: float | None = None) -> bool:
+        now = time.time() if now is None else now
+        ttl = self.ttl_s if meta.photo_url else self.negative_ttl_s
+        return now - meta.checked_at < ttl
+
+    def update_listing(self, recipe_id: str, name: str | None, total_time: Any) -> None:
+        # nazwa/czas przychodzą z kalendarza za darmo - aktualizujemy bez pobierania strony
+        meta = self._items.get(recipe_id)
+        if meta is None or (meta.name == name and meta.total_time == total_time):
+            return
+        meta.name = name
+        meta.total_time = total_time
+        self._dirty = True
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi import Request, Response
+
+JSON_CACHE_CONTROL = "no-cache"
+
+
+@dataclass(frozen=True)
+class EncodedJSON:
+    body: bytes
+    gzipped: bytes
+    etag: str
+
+    @classmethod
+    def encode(cls, obj: Any) -> "EncodedJSON":
+        body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        # mtime=0 -> te same bajty dla tej samej treści
+        return cls(body=body, gzipped=gzip.compress(body, compresslevel=6, mtime=0), etag=etag)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    if inm.strip() == "*":
+        return True
+    tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+    return etag in tags
+
+
+def accepts_gzip(request: Request) -> bool:
+    # kodowanie z q=0 to odmowa; "*" obejmuje gzip, jeśli ten nie jest wymieniony osobno
+    qualities: dict[str, float] = {}
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, *params = (x.strip() for x in part.split(";"))
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding.lower()] = q
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def encoded_json_response(request: Request, encoded: EncodedJSON) -> Response:
+    headers = {
+        "ETag": encoded.etag,
+        "Cache-Control": JSON_CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request, encoded.etag):
+        return Response(status_code=304, headers=headers)
+    if accepts_gzip(request):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=encoded.gzipped, media_type="application/json", headers=headers)
+    return Response(content=encoded.body, media_type="application/json", headers=headers)
@@ -1,33 +1,87 @@
 import asyncio
 import json
+import os
 import re
+import time
 from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from datetime import date
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import Any
 import contextlib
 
 import aiohttp
-from fastapi import FastAPI, Response
-from fastapi.responses import FileResponse, JSONResponse
-from PIL import Image
-
-from cookidoo_api import Cookidoo
-from cookidoo_api.types import CookidooConfig
-from cookidoo_api.helpers import get_localization_options
-
-
-DATA_DIR = Path("/data")
+from fastapi import FastAPI, Query, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+
+from .client import CookidooClient
+from .collage import CollageRenderer
+from .downloads import DownloadError, Downloader
+from .events import Broadcaster
+from .images import ImageStore
+from .metrics import LatencyMiddleware, metrics
+from .recipe_cache import RecipeCache, RecipeMeta
+from .responses import EncodedJSON, encoded_json_response, etag_matches
+from .utils import read_json, write_json_atomic
+from .variants import FORMATS, VariantCache, snap_width, source_tag
+from .weeks import WeekCache, week_start
+
+
+# poza HA (np. benchmark) katalog danych można przestawić zmienną środowiskową
+DATA_DIR = Path(os.environ.get("COOKIDOO_DATA_DIR", "/data"))
 IMG_DIR = DATA_DIR / "images"
 TODAY_JSON = DATA_DIR / "today.json"
 WEEK_JSON = DATA_DIR / "week.json"
 TODAY_JPG = DATA_DIR / "today.jpg"
 WEEK_JPG = DATA_DIR / "week.jpg"
 OPTIONS_JSON = DATA_DIR / "options.json"
+RECIPES_JSON = DATA_DIR / "recipes.json"
+AUTH_JSON = DATA_DIR / "auth.json"
+COLLAGES_JSON = DATA_DIR / "collages.json"
+VARIANTS_DIR = DATA_DIR / "variants"
+IMAGES_JSON = DATA_DIR / "images.json"
+WEEKS_DIR = DATA_DIR / "weeks"
+
+# zdjęcia przepisów praktycznie się nie zmieniają
+RECIPE_TTL_S = 7 * 24 * 3600
+RECIPE_NEGATIVE_TTL_S = 6 * 3600
+
+PHOTO_RE = re.compile(
+    r"(https://assets\.tmecosys\.com/image/upload/t_web_rdp_recipe[^\"']+\.jpg)"
+)
+
+VARIANT_MEM_BYTES = 16 * 1024 * 1024
+VARIANT_DISK_BYTES = 128 * 1024 * 1024
+
+# zdjęcie przepisu pod danym id praktycznie się nie zmienia, kolaże - co odświeżenie
+RECIPE_IMG_CACHE_CONTROL = "public, max-age=86400"
+COLLAGE_CACHE_CONTROL = "public, no-cache"
+
+# zakres /api/week?offset=N i /api/range względem bieżącego tygodnia
+WEEKS_RETAIN_PAST = 4
+WEEKS_AHEAD = 4
+MAX_RANGE_DAYS = 28
+# następny tydzień odświeżany w tle najwyżej raz na godzinę
+PREFETCH_MAX_AGE_S = 3600
+# szczegóły błędów Cookidoo trafiają tylko do logu
+UPSTREAM_ERROR = "Cookidoo unavailable"
 
 IMG_DIR.mkdir(parents=True, exist_ok=True)
 
+# metadane przepisów trzymane co najmniej tak długo, jak tygodnie w _weeks
+_recipe_cache = RecipeCache(
+    RECIPES_JSON, RECIPE_TTL_S, RECIPE_NEGATIVE_TTL_S, retention_s=7 * 24 * 3600 * (WEEKS_RETAIN_PAST + 1)
+)
+_client = CookidooClient(AUTH_JSON)
+_collages = CollageRenderer(COLLAGES_JSON)
+_variants = VariantCache(VARIANTS_DIR, VARIANT_MEM_BYTES, VARIANT_DISK_BYTES)
+_events = Broadcaster()
+# kolaże dzienne żyją tak długo, jak tygodnie trzymane w _weeks (+ bieżący tydzień)
+_images = ImageStore(IMG_DIR, IMAGES_JSON, day_retention_days=7 * (WEEKS_RETAIN_PAST + 1))
+_downloads = Downloader()
+_weeks = WeekCache(WEEKS_DIR)
+_week_tasks: dict[date, asyncio.Task] = {}
+
 
 @dataclass
 class Settings:
@@ -35,6 +89,7 @@ class Settings:
     password: str
     country: str = "pl"
     refresh_minutes: int = 15
+    image_cache_mb: int = 200
 
 
 def load_settings() -> Settings:
@@ -44,6 +99,7 @@ def load_settings() -> Settings:
         password=raw["password"],
         country=raw.get("country", "pl"),
         refresh_minutes=int(raw.get("refresh_minutes", 15)),
+        image_cache_mb=int(raw.get("image_cache_mb", 200)),
     )
 
 
@@ -56,172 +112,400 @@ def cookidoo_base_and_lang(localization_url: str, lang: str) -> tuple[str, str]:
 
 
 async def scrape_recipe_photo_url(
-    session: aiohttp.ClientSession, base: str, lang: str, recipe_id: str
-) -> str | None:
+    session: aiohttp.ClientSession,
+    base: str,
+    lang: str,
+    recipe_id: str,
+    cached: RecipeMeta | None = None,
+) -> RecipeMeta | None:
+    # warunkowy GET przy znanych walidatorach; None = strona nie odpowiedziała poprawnie
     url = f"{base}/recipes/recipe/{lang}/{recipe_id}"
-    async with session.get(url) as r:
+    headers: dict[str, str] = {}
+    if cached is not None:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+    async with session.get(url, headers=headers) as r:
+        if r.status == 304 and cached is not None:
+            cached.checked_at = time.time()
+            return cached
         if r.status != 200:
             return None
         html = await r.text()
-
-    m = re.search(
-        r"(https://assets\.tmecosys\.com/image/upload/t_web_rdp_recipe[^\"']+\.jpg)",
-        html,
+        etag = r.headers.get("ETag")
+        last_modified = r.headers.get("Last-Modified")
+
+    m = PHOTO_RE.search(html)
+    return RecipeMeta(
+        photo_url=m.group(1) if m else None,
+        etag=etag,
+        last_modified=last_modified,
+        checked_at=time.time(),
     )
-    return m.group(1) if m else None
 
 
-async def download_if_needed(session: aiohttp.ClientSession, url: str, out_path: Path) -> None:
-    if out_path.exists() and out_path.stat().st_size > 10_000:
-        return
-    async with session.get(url) as r:
-        r.raise_for_status()
-        out_path.write_bytes(await r.read())
+async def resolve_recipe_meta(
+    session: aiohttp.ClientSession, base: str, lang: str, recipe: Any
+) -> RecipeMeta:
+    rid = recipe.id
+    name = recipe.name
+    total_time = getattr(recipe, "total_time", None)
 
+    cached = _recipe_cache.get(rid)
+    if cached is not None and _recipe_cache.is_fresh(cached):
+        metrics.cache_event("recipe_meta", "hit")
+        _recipe_cache.update_listing(rid, name, total_time)
+        return cached
 
-def make_collage(image_paths: list[Path], out_path: Path) -> None:
-    if not image_paths:
-        return
+    with metrics.phase("scraping"):
+        meta = await scrape_recipe_photo_url(session, base, lang, rid, cached)
+    if meta is None:
+        metrics.cache_event("recipe_meta", "error")
+        # błąd strony: zostajemy przy starych danych (jeśli są), bez przedłużania TTL
+        return cached or RecipeMeta(name=name, total_time=total_time)
+    metrics.cache_event("recipe_meta", "revalidated" if meta is cached else "miss")
 
-    imgs = [Image.open(p).convert("RGB") for p in image_paths[:4]]
+    meta.name = name
+    meta.total_time = total_time
+    _recipe_cache.put(rid, meta)
+    return meta
 
-    if len(imgs) == 1:
-        imgs[0].save(out_path, "JPEG", quality=90)
-        return
 
-    target_w, target_h = 640, 480
-    imgs = [im.resize((target_w, target_h)) for im in imgs]
+async def download_if_needed(session: aiohttp.ClientSession, url: str, out_path: Path) -> bool:
+    # nieudane pobranie nie przerywa odświeżania - przepis zostaje bez lokalnego obrazka
+    try:
+        await _downloads.fetch(session, url, out_path)
+    except (aiohttp.ClientError, asyncio.TimeoutError, DownloadError) as e:
+        print("Image download error:", repr(e))
+        return False
+    return True
+
+
+def today_slice(week: dict[str, Any]) -> dict[str, Any]:
+    today_id = date.today().isoformat()
+    days = week.get("days") or []
+    return next((x for x in days if x.get("date") == today_id), {"date": today_id, "recipes": []})
+
+
+def day_listing(recipes: list[Any]) -> list[tuple[Any, ...]]:
+    return [(r.id, r.name, getattr(r, "total_time", None)) for r in recipes]
+
+
+def reusable_day(prev: dict[str, Any] | None, recipes: list[Any]) -> bool:
+    # dzień bez zmian w kalendarzu i z kompletem plików na dysku -> nic do zrobienia
+    if prev is None:
+        return False
+    prev_listing = [(x["id"], x["name"], x.get("total_time")) for x in prev.get("recipes") or []]
+    if prev_listing != day_listing(recipes):
+        return False
+    for x in prev.get("recipes") or []:
+        if x.get("image_local"):
+            # plik niesprawdzony w tym uruchomieniu (np. po restarcie) -> przebudowa go zwaliduje
+            if not _downloads.is_verified(IMG_DIR / f"{x['id']}.jpg"):
+                return False
+            continue
+        # brak zdjęcia: powtarzamy, chyba że cache świeżo potwierdził, że strona go nie ma
+        # (błąd strony/pobrania nie zapisuje takiego wpisu)
+        meta = _recipe_cache.get(x["id"])
+        if x.get("image_remote") or meta is None or meta.photo_url or not _recipe_cache.is_fresh(meta):
+            return False
+    if prev.get("day_image_local") and not (IMG_DIR / f"day_{prev['date']}.jpg").exists():
+        return False
+    return True
+
+
+async def build_day(
+    session: aiohttp.ClientSession, base: str, lang: str, day_id: str, recipes: list[Any]
+) -> dict[str, Any]:
+    day_img_paths: list[Path] = []
+    out_recipes: list[dict[str, Any]] = []
+
+    # URL obrazków z cache (/data/recipes.json); scrapujemy tylko nowe/przeterminowane
+    photo_urls = {r.id: (await resolve_recipe_meta(session, base, lang, r)).photo_url for r in recipes}
+
+    # obrazki dnia pobierane równolegle (powtórzenia tej samej ścieżki łączy Downloader)
+    with metrics.phase("downloads"):
+        to_fetch = [(rid, url) for rid, url in photo_urls.items() if url]
+        ok = await asyncio.gather(
+            *(download_if_needed(session, url, IMG_DIR / f"{rid}.jpg") for rid, url in to_fetch)
+        )
+    # tylko sprawdzone pliki trafiają do odpowiedzi i kolaży
+    valid = {rid for (rid, _), fetched in zip(to_fetch, ok) if fetched}
+
+    for r in recipes:
+        rid = r.id
+        photo_url = photo_urls[rid]
+        local_path = IMG_DIR / f"{rid}.jpg"
+
+        if rid in valid:
+            day_img_paths.append(local_path)
+
+        out_recipes.append(
+            {
+                "id": rid,
+                "name": r.name,
+                "total_time": getattr(r, "total_time", None),
+                "recipe_url": f"{base}/recipes/recipe/{lang}/{rid}",
+                "image_local": f"/api/image/{rid}.jpg" if rid in valid else None,
+                "image_remote": photo_url,
+            }
+        )
+
+    # opcjonalna dzienna kolażówka (jak chcesz później do dashboardu)
+    day_jpg = IMG_DIR / f"day_{day_id}.jpg"
+    if day_img_paths:
+        await _collages.render(day_img_paths, day_jpg)
+
+    return {
+        "date": day_id,
+        "recipes": out_recipes,
+        "day_image_local": f"/api/day/{day_id}.jpg" if day_jpg.exists() else None,
+    }
+
+
+def days_by_date(week: dict[str, Any] | None) -> dict[str, dict[str, Any]]:
+    return {x.get("date"): x for x in (week or {}).get("days") or []}
+
+
+async def build_week(
+    day: date, prev_days: dict[str, dict[str, Any]], week_jpg: Path | None = None
+) -> dict[str, Any]:
+    s = load_settings()
+
+    # sesja i tokeny żyją przez cały czas działania add-ona (patrz lifespan)
+    async def fetch_calendar(api: Any) -> list[Any]:
+        with metrics.phase("calendar"):
+            return await api.get_recipes_in_calendar_week(day)
+
+    days = await _client.call(s, fetch_calendar)
+    session = _client.session
+    loc = _client.localization
+
+    base, lang = cookidoo_base_and_lang(loc.url, loc.language)
+
+    week_days: list[dict[str, Any]] = []
 
-    if len(imgs) == 2:
-        canvas = Image.new("RGB", (target_w * 2, target_h))
-        canvas.paste(imgs[0], (0, 0))
-        canvas.paste(imgs[1], (target_w, 0))
-    else:
-        canvas = Image.new("RGB", (target_w * 2, target_h * 2))
-        canvas.paste(imgs[0], (0, 0))
-        canvas.paste(imgs[1], (target_w, 0))
-        canvas.paste(imgs[2], (0, target_h))
-        if len(imgs) >= 4:
-            canvas.paste(imgs[3], (target_w, target_h))
+    for d in days:
+        day_id = getattr(d, "id", None) or ""
+        recipes = getattr(d, "recipes", None) or []
 
-    canvas.save(out_path, "JPEG", quality=90)
+        prev = prev_days.get(day_id)
+        if reusable_day(prev, recipes):
+            week_days.append(prev)
+        else:
+            week_days.append(await build_day(session, base, lang, day_id, recipes))
+    _recipe_cache.save()
+
+    # kolaż tygodniowy (pierwsze 4 obrazki z tygodnia); pomijany gdy wejście bez zmian
+    week_image_pool = [
+        IMG_DIR / f"{x['id']}.jpg" for d in week_days for x in d["recipes"] if x.get("image_local")
+    ]
+    if week_jpg is not None and week_image_pool:
+        await _collages.render(week_image_pool, week_jpg)
+    _collages.save()
+
+    return {
+        "generated_at": date.today().isoformat(),
+        "week_start": week_start(day).isoformat(),
+        "days": week_days,
+    }
 
 
 async def refresh_week() -> dict[str, Any]:
-    s = load_settings()
+    today = date.today()
+    start = week_start(today)
+    # po zmianie tygodnia bieżący plan zwykle jest już w cache z prefetchu
+    cached = _weeks.get(start)
+    prev_days = {**days_by_date(cached.payload if cached else None), **days_by_date(_state["week"])}
+    payload = await build_week(today, prev_days, WEEK_JPG)
+    with metrics.phase("file_writes"):
+        _weeks.put(start, payload)
+    return payload
+
+
+async def _fetch_week(start: date) -> dict[str, Any]:
+    cached = _weeks.get(start)
+    payload = await build_week(start, days_by_date(cached.payload if cached else None))
+    _weeks.put(start, payload)
+    return payload
+
+
+def _week_task_done(start: date, task: asyncio.Task) -> None:
+    _week_tasks.pop(start, None)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Week {start} fetch error:", repr(task.exception()))
+
+
+def schedule_week(start: date) -> asyncio.Task:
+    # równoczesne żądania o ten sam tydzień -> jedno pobranie
+    task = _week_tasks.get(start)
+    if task is None:
+        task = asyncio.create_task(_fetch_week(start))
+        _week_tasks[start] = task
+        task.add_done_callback(lambda t, start=start: _week_task_done(start, t))
+    return task
+
+
+async def load_week(start: date) -> dict[str, Any]:
+    return await asyncio.shield(schedule_week(start))
+
+
+async def prefetch_next_week(max_age_s: float) -> None:
+    current = week_start(date.today())
+    _weeks.prune(current - timedelta(weeks=WEEKS_RETAIN_PAST))
+    nxt = current + timedelta(weeks=1)
+    age = _weeks.age(nxt)
+    if age is None or age > max_age_s:
+        await load_week(nxt)
+
+
+# gotowe (zakodowane + gzip) odpowiedzi; podmieniane w całości, nigdy modyfikowane
+_published: dict[str, EncodedJSON] = {
+    "week": EncodedJSON.encode({"days": [], "version": 0}),
+    "today": EncodedJSON.encode({"date": None, "recipes": [], "version": 0}),
+}
+
+# ostatni opublikowany stan; "version" rośnie tylko przy realnej zmianie week/today
+_state: dict[str, Any] = {
+    "version": 0,
+    "week": {"days": []},
+    "today": {"date": None, "recipes": []},
+}
+
+
+def publish(week: dict[str, Any], today: dict[str, Any]) -> None:
+    _published["week"] = EncodedJSON.encode(week)
+    _published["today"] = EncodedJSON.encode(today)
+
+
+def change_event() -> dict[str, Any]:
+    # zwięzłe zdarzenie: klient porównuje ETagi i dociąga tylko to, co się zmieniło
+    return {
+        "today": _published["today"].etag.strip('"'),
+        "week": _published["week"].etag.strip('"'),
+        "date": _state["today"].get("date"),
+    }
+
+
+def apply_state(week: dict[str, Any], today: dict[str, Any]) -> bool:
+    if week.get("days") == _state["week"].get("days") and today == _state["today"]:
+        return False
+
+    version = _state["version"] + 1
+    week = {**week, "version": version}
+    today_out = {**today, "version": version}
+    with metrics.phase("file_writes"):
+        write_json_atomic(WEEK_JSON, week)
+        write_json_atomic(TODAY_JSON, today_out)
+    _state.update(version=version, week=week, today=today)
+    publish(week, today_out)
+    _events.publish(version, change_event())
+    return True
+
+
+def publish_from_disk() -> None:
+    week = read_json(WEEK_JSON)
+    if not isinstance(week, dict):
+        return
+    version = int(week.get("version") or 0)
+    today = today_slice(week)
+    _state.update(version=version, week=week, today=today)
+    publish(week, {**today, "version": version})
+    _events.set_initial(version, change_event())
 
-    locs = await get_localization_options(country=s.country)
-    if not locs:
-        raise RuntimeError(f"Brak lokalizacji dla country={s.country}")
-
-    loc = next((l for l in locs if l.language.lower().startswith("pl")), locs[0])
-    cfg = CookidooConfig(localization=loc, email=s.email, password=s.password)
-
-    async with aiohttp.ClientSession() as session:
-        api = Cookidoo(session, cfg)
-        await api.login()
-
-        today = date.today()
-        days = await api.get_recipes_in_calendar_week(today)
-
-        base, lang = cookidoo_base_and_lang(cfg.localization.url, cfg.localization.language)
-
-        week_days: list[dict[str, Any]] = []
-        week_image_pool: list[Path] = []
-
-        # Zbierz unikalne recipe_id z tygodnia -> mniej scrapowania
-        all_recipes = {}
-        for d in days:
-            for r in (getattr(d, "recipes", None) or []):
-                all_recipes[r.id] = r
-
-        # Scrapuj URL obrazków (po jednym na przepis)
-        photo_urls: dict[str, str | None] = {}
-        for rid in all_recipes.keys():
-            photo_urls[rid] = await scrape_recipe_photo_url(session, base, lang, rid)
-
-        # Pobierz obrazki i zbuduj payload dzienny/tygodniowy
-        for d in days:
-            day_id = getattr(d, "id", None) or ""
-            recipes = getattr(d, "recipes", None) or []
-
-            day_img_paths: list[Path] = []
-            out_recipes: list[dict[str, Any]] = []
-
-            for r in recipes:
-                rid = r.id
-                photo_url = photo_urls.get(rid)
-                local_path = IMG_DIR / f"{rid}.jpg"
-
-                if photo_url:
-                    await download_if_needed(session, photo_url, local_path)
-                    if local_path.exists():
-                        day_img_paths.append(local_path)
-                        week_image_pool.append(local_path)
-
-                out_recipes.append(
-                    {
-                        "id": rid,
-                        "name": r.name,
-                        "total_time": getattr(r, "total_time", None),
-                        "recipe_url": f"{base}/recipes/recipe/{lang}/{rid}",
-                        "image_local": f"/api/image/{rid}.jpg" if local_path.exists() else None,
-                        "image_remote": photo_url,
-                    }
-                )
-
-            # opcjonalna dzienna kolażówka (jak chcesz później do dashboardu)
-            day_jpg = IMG_DIR / f"day_{day_id}.jpg"
-            if day_img_paths:
-                make_collage(day_img_paths, day_jpg)
-
-            week_days.append(
-                {
-                    "date": day_id,
-                    "recipes": out_recipes,
-                    "day_image_local": f"/api/day/{day_id}.jpg" if day_jpg.exists() else None,
-                }
-            )
-
-        payload = {
-            "generated_at": date.today().isoformat(),
-            "days": week_days,
-        }
+    # today.json z poprzedniego dnia (add-on był wyłączony o północy)
+    on_disk = read_json(TODAY_JSON)
+    if not isinstance(on_disk, dict) or on_disk.get("date") != today["date"]:
+        write_json_atomic(TODAY_JSON, {**today, "version": version})
+
+
+def current_week() -> dict[str, Any] | None:
+    # opublikowany tydzień, a po zmianie tygodnia (przed odświeżeniem) plan z prefetchu
+    start = week_start(date.today())
+    if _state["week"].get("week_start") == start.isoformat():
+        return _state["week"]
+    cached = _weeks.get(start)
+    return cached.payload if cached is not None else None
 
-        WEEK_JSON.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
 
-        # kolaż tygodniowy (pierwsze 4 obrazki z tygodnia)
-        if week_image_pool:
-            make_collage(week_image_pool, WEEK_JPG)
+def roll_today() -> bool:
+    # nowy dzień: today.json liczony z ostatniego tygodnia, bez odpytywania Cookidoo
+    week = current_week() or _state["week"]
+    return apply_state(week, today_slice(week))
+
+
+def seconds_until_midnight() -> float:
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (midnight - now).total_seconds()
+
+
+async def _midnight_loop(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            # +1 s zapasu, żeby date.today() na pewno wskazywało już nowy dzień
+            await asyncio.wait_for(stop.wait(), timeout=seconds_until_midnight() + 1)
+        except asyncio.TimeoutError:
+            pass
+        if stop.is_set():
+            return
+        try:
+            roll_today()
+        except Exception as e:
+            print("Midnight rollover error:", repr(e))
 
-        # today.json jako wycinek z week.json
-        today_id = date.today().isoformat()
-        today_obj = next((x for x in week_days if x["date"] == today_id), {"date": today_id, "recipes": []})
-        TODAY_JSON.write_text(json.dumps(today_obj, ensure_ascii=False), encoding="utf-8")
 
-        # (celowo) brak api.logout() bo biblioteka go nie ma
-        return payload
+def referenced_images(week: dict[str, Any]) -> set[str]:
+    names: set[str] = set()
+    for day in week.get("days") or []:
+        if day.get("day_image_local"):
+            names.add(f"day_{day['date']}.jpg")
+        for x in day.get("recipes") or []:
+            if x.get("image_local"):
+                names.add(f"{x['id']}.jpg")
+    return names
 
 
-_cache_week: dict[str, Any] = {"days": []}
-_cache_today: dict[str, Any] = {"date": None, "recipes": []}
+async def collect_images(budget_mb: int) -> None:
+    # chronimy wszystko, do czego linkują serwowane tygodnie (bieżący, następny i z cache)
+    referenced = referenced_images(_state["week"])
+    for cached in _weeks.all():
+        referenced |= referenced_images(cached.payload)
+    _images.mark_referenced(referenced)
+    removed = await _images.collect(budget_mb * 1024 * 1024)
+    for name in removed:
+        _collages.forget(IMG_DIR / name)
+    _collages.save()
 
 
 async def _refresh_loop(stop: asyncio.Event) -> None:
     while not stop.is_set():
+        metrics.begin_refresh()
+        error: Exception | None = None
         try:
             data = await refresh_week()
-            _cache_week.update(data)
-            if TODAY_JSON.exists():
-                _cache_today.update(json.loads(TODAY_JSON.read_text(encoding="utf-8")))
+            apply_state(data, today_slice(data))
         except Exception as e:
             print("Refresh error:", repr(e))
-            if WEEK_JSON.exists():
-                _cache_week.update(json.loads(WEEK_JSON.read_text(encoding="utf-8")))
-            if TODAY_JSON.exists():
-                _cache_today.update(json.loads(TODAY_JSON.read_text(encoding="utf-8")))
+            error = e
+
+        # spokojny moment po odświeżeniu: następny tydzień (przepisy, zdjęcia, kolaże);
+        # liczony do tego samego cyklu, łączny czas widać w fazie "prefetch"
+        try:
+            with metrics.phase("prefetch"):
+                await prefetch_next_week(PREFETCH_MAX_AGE_S)
+        except Exception as e:
+            print("Prefetch error:", repr(e))
+        metrics.end_refresh(error)
 
         s = load_settings()
+        try:
+            await collect_images(s.image_cache_mb)
+        except Exception as e:
+            print("Image cache cleanup error:", repr(e))
+
         sleep_s = max(60, int(s.refresh_minutes) * 60)
         try:
             await asyncio.wait_for(stop.wait(), timeout=sleep_s)
@@ -232,19 +516,39 @@ async def _refresh_loop(stop: asyncio.Event) -> None:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     stop = asyncio.Event()
-    task = asyncio.create_task(_refresh_loop(stop))
+    # ostatni znany stan z dysku, zanim pierwsze odświeżenie się skończy
+    publish_from_disk()
+    _downloads.cleanup(IMG_DIR)
+    await _client.start()
+    tasks = [
+        asyncio.create_task(_refresh_loop(stop)),
+        asyncio.create_task(_midnight_loop(stop)),
+    ]
     try:
         yield
     finally:
         stop.set()
-        task.cancel()
-        with contextlib.suppress(asyncio.CancelledError):
-            await task
+        # uvicorn dochodzi tu dopiero po zamknięciu połączeń; wiszące strumienie SSE
+        # ucina --timeout-graceful-shutdown w run.sh
+        _events.close()
+        tasks += _week_tasks.values()
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await task
+        await _client.close()
+        _collages.shutdown()
+        _variants.shutdown()
 
 
 app = FastAPI(title="Cookidoo Today", lifespan=lifespan)
 
 
+# strumień SSE nie ma sensownego "czasu odpowiedzi"
+app.add_middleware(LatencyMiddleware, exclude={"/api/events"})
+
+
 @app.get("/")
 async def root() -> JSONResponse:
     return JSONResponse(
@@ -252,55 +556,164 @@ async def root() -> JSONResponse:
             "ok": True,
             "endpoints": [
                 "/api/today",
-                "/api/week",
+                "/api/week?offset=<N>",
+                "/api/range?start=<YYYY-MM-DD>&days=<N>",
+                "/api/events",
+                "/api/status",
+                "/metrics",
                 "/api/today.jpg",
                 "/api/week.jpg",
-                "/api/image/<recipe_id>.jpg",
-                "/api/day/<YYYY-MM-DD>.jpg",
+                "/api/image/<recipe_id>.jpg?w=<px>",
+                "/api/day/<YYYY-MM-DD>.jpg?w=<px>",
             ],
         }
     )
 
 
 @app.get("/api/today")
-async def api_today() -> JSONResponse:
-    if TODAY_JSON.exists():
-        return JSONResponse(json.loads(TODAY_JSON.read_text(encoding="utf-8")))
-    return JSONResponse(_cache_today)
+async def api_today(request: Request) -> Response:
+    return encoded_json_response(request, _published["today"])
 
 
 @app.get("/api/week")
-async def api_week() -> JSONResponse:
-    if WEEK_JSON.exists():
-        return JSONResponse(json.loads(WEEK_JSON.read_text(encoding="utf-8")))
-    return JSONResponse(_cache_week)
+async def api_week(
+    request: Request, offset: int = Query(0, ge=-WEEKS_RETAIN_PAST, le=WEEKS_AHEAD)
+) -> Response:
+    if offset == 0 and current_week() is _state["week"]:
+        return encoded_json_response(request, _published["week"])
+
+    start = week_start(date.today()) + timedelta(weeks=offset)
+    cached = _weeks.get(start)
+    if cached is None:
+        try:
+            await load_week(start)
+        except Exception as e:
+            print("Week request error:", repr(e))
+            return JSONResponse({"error": UPSTREAM_ERROR}, status_code=502)
+        cached = _weeks.get(start)
+    elif offset > 0 and time.time() - cached.fetched_at > PREFETCH_MAX_AGE_S:
+        # przyszłe tygodnie: serwujemy z cache, odświeżamy w tle
+        schedule_week(start)
+    return encoded_json_response(request, cached.encoded)
+
+
+@app.get("/api/range")
+async def api_range(
+    start: date | None = None, days: int = Query(14, ge=1, le=MAX_RANGE_DAYS)
+) -> JSONResponse:
+    first = start or date.today()
+    last = first + timedelta(days=days - 1)
+    current = week_start(date.today())
+    if not (
+        current - timedelta(weeks=WEEKS_RETAIN_PAST)
+        <= week_start(first)
+        <= week_start(last)
+        <= current + timedelta(weeks=WEEKS_AHEAD)
+    ):
+        return JSONResponse({"error": "range outside of cached weeks"}, status_code=400)
+
+    out: list[dict[str, Any]] = []
+    ws = week_start(first)
+    while ws <= last:
+        week = current_week() if ws == current else None
+        if week is None:
+            cached = _weeks.get(ws)
+            try:
+                week = cached.payload if cached is not None else await load_week(ws)
+            except Exception as e:
+                print("Range request error:", repr(e))
+                return JSONResponse({"error": UPSTREAM_ERROR}, status_code=502)
+        out.extend(
+            d for d in week.get("days") or [] if first.isoformat() <= d.get("date", "") <= last.isoformat()
+        )
+        ws += timedelta(weeks=1)
+
+    return JSONResponse({"start": first.isoformat(), "end": last.isoformat(), "days": out})
+
+
+@app.get("/api/status")
+async def api_status() -> JSONResponse:
+    s = load_settings()
+    age = metrics.last_success_age()
+    return JSONResponse(
+        {
+            # "ok" = ostatnie udane odświeżenie nie starsze niż 3 interwały
+            "ok": age is not None and age < 3 * max(60, s.refresh_minutes * 60),
+            "version": _state["version"],
+            "today": _state["today"].get("date"),
+            "sse_subscribers": _events.subscribers,
+            "image_cache_bytes": _images.total_bytes,
+            **metrics.status(),
+        }
+    )
+
+
+@app.get("/metrics")
+async def metrics_endpoint() -> PlainTextResponse:
+    gauges = {
+        "cookidoo_plan_version": _state["version"],
+        "cookidoo_sse_subscribers": _events.subscribers,
+        "cookidoo_image_cache_bytes": _images.total_bytes,
+    }
+    return PlainTextResponse(metrics.prometheus(gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/events")
+async def api_events(request: Request, since: int | None = Query(None, ge=0)) -> StreamingResponse:
+    # wznowienie: EventSource sam wysyła Last-Event-ID po zerwaniu połączenia
+    last_id = request.headers.get("last-event-id")
+    if since is None and last_id and last_id.isdigit():
+        since = int(last_id)
+    return StreamingResponse(
+        _events.stream(since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def image_response(request: Request, path: Path, w: int | None, cache_control: str) -> Response:
+    if not path.exists():
+        return Response(status_code=404)
+    if path.parent == IMG_DIR:
+        _images.touch(path.name)
+
+    fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    width = snap_width(w)
+    headers = {"Cache-Control": cache_control, "Vary": "Accept"}
+
+    if width is None and fmt == "jpeg":
+        etag = f'"{source_tag(path)}"'
+        headers["ETag"] = etag
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(path, media_type="image/jpeg", headers=headers)
+
+    data, etag = await _variants.get(path, width, fmt)
+    headers["ETag"] = etag
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type=FORMATS[fmt][0], headers=headers)
 
 
 @app.get("/api/today.jpg")
-async def api_today_jpg() -> Response:
-    if TODAY_JPG.exists():
-        return FileResponse(TODAY_JPG, media_type="image/jpeg")
-    return Response(status_code=404)
+async def api_today_jpg(request: Request, w: int | None = Query(None, ge=1, le=4096)) -> Response:
+    return await image_response(request, TODAY_JPG, w, COLLAGE_CACHE_CONTROL)
 
 
 @app.get("/api/week.jpg")
-async def api_week_jpg() -> Response:
-    if WEEK_JPG.exists():
-        return FileResponse(WEEK_JPG, media_type="image/jpeg")
-    return Response(status_code=404)
+async def api_week_jpg(request: Request, w: int | None = Query(None, ge=1, le=4096)) -> Response:
+    return await image_response(request, WEEK_JPG, w, COLLAGE_CACHE_CONTROL)
 
 
 @app.get("/api/image/{recipe_id}.jpg")
-async def api_recipe_jpg(recipe_id: str) -> Response:
+async def api_recipe_jpg(
+    recipe_id: str, request: Request, w: int | None = Query(None, ge=1, le=4096)
+) -> Response:
     p = IMG_DIR / f"{recipe_id}.jpg"
-    if p.exists():
-        return FileResponse(p, media_type="image/jpeg")
-    return Response(status_code=404)
+    return await image_response(request, p, w, RECIPE_IMG_CACHE_CONTROL)
 
 
 @app.get("/api/day/{day}.jpg")
-async def api_day_jpg(day: str) -> Response:
+async def api_day_jpg(day: str, request: Request, w: int | None = Query(None, ge=1, le=4096)) -> Response:
     p = IMG_DIR / f"day_{day}.jpg"
-    if p.exists():
-        return FileResponse(p, media_type="image/jpeg")
-    return Response(status_code=404)
+    return await image_response(request, p, w, COLLAGE_CACHE_CONTROL)
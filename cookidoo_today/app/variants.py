@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import io
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+from .metrics import metrics
+from .utils import write_bytes_atomic
+
+# żądana szerokość jest zaokrąglana w górę do jednego z progów -> skończona liczba wariantów
+VARIANT_WIDTHS = (160, 320, 480, 640, 960, 1280, 1920)
+
+FORMATS = {
+    "jpeg": ("image/jpeg", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+    "webp": ("image/webp", "webp", {"quality": 80, "method": 4}),
+}
+
+
+def snap_width(width: int | None) -> int | None:
+    if width is None:
+        return None
+    return next((w for w in VARIANT_WIDTHS if w >= width), VARIANT_WIDTHS[-1])
+
+
+def source_tag(path: Path) -> str:
+    st = path.stat()
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def render_variant(src: Path, width: int | None, fmt: str) -> bytes:
+    _, _, save_kwargs = FORMATS[fmt]
+    with Image.open(src) as im:
+        if width is not None and im.width > width:
+            height = max(1, round(im.height * width / im.width))
+            im.draft("RGB", (width, height))
+            out = im.convert("RGB").resize((width, height), Image.LANCZOS)
+        else:
+            out = im.convert("RGB")
+    buf = io.BytesIO()
+    out.save(buf, fmt.upper(), **save_kwargs)
+    return buf.getvalue()
+
+
+class VariantCache:
+    """LRU (pamięć + dysk) przeskalowanych/przekonwertowanych wersji obrazków."""
+
+    def __init__(self, directory: Path, mem_budget: int, disk_budget: int, max_workers: int = 1) -> None:
+        self.directory = directory
+        self.mem_budget = mem_budget
+        self.disk_budget = disk_budget
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="variants")
+        self._mem: OrderedDict[str, bytes] = OrderedDict()
+        self._mem_bytes = 0
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_bytes = 0
+        self._pending: dict[str, asyncio.Future[bytes]] = {}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._scan_disk()
+
+    def _scan_disk(self) -> None:
+        entries = []
+        for p in self.directory.iterdir():
+            if not p.is_file() or p.name.startswith("."):
+                continue
+            st = p.stat()
+            entries.append((st.st_atime, p.name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._disk[name] = size
+            self._disk_bytes += size
+
+    def _remember(self, name: str, data: bytes) -> None:
+        if len(data) > self.mem_budget:
+            return
+        old = self._mem.pop(name, None)
+        if old is not None:
+            self._mem_bytes -= len(old)
+        self._mem[name] = data
+        self._mem_bytes += len(data)
+        while self._mem_bytes > self.mem_budget:
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_bytes -= len(evicted)
+
+    def _store_disk(self, name: str, data: bytes) -> None:
+        write_bytes_atomic(self.directory / name, data)
+        self._disk_bytes -= self._disk.pop(name, 0)
+        self._disk[name] = len(data)
+        self._disk_bytes += len(data)
+        while self._disk_bytes > self.disk_budget and len(self._disk) > 1:
+            evicted, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            (self.directory / evicted).unlink(missing_ok=True)
+
+    def _load_disk(self, name: str) -> bytes | None:
+        if name not in self._disk:
+            return None
+        path = self.directory / name
+        try:
+            data = path.read_bytes()
+        except OSError:
+            self._disk_bytes -= self._disk.pop(name, 0)
+            return None
+        self._disk.move_to_end(name)
+        # atime jako kolejność LRU po restarcie (noatime na /data jest częste)
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return data
+
+    def _produce(self, name: str, src: Path, width: int | None, fmt: str) -> bytes:
+        # wątek roboczy (jedyny) - tylko on dotyka indeksu dyskowego
+        data = self._load_disk(name)
+        if data is None:
+            data = render_variant(src, width, fmt)
+            self._store_disk(name, data)
+        return data
+
+    async def get(self, src: Path, width: int | None, fmt: str) -> tuple[bytes, str]:
+        tag = source_tag(src)
+        key = hashlib.sha1(f"{src.name}|{tag}".encode("utf-8")).hexdigest()[:16]
+        _, ext, _ = FORMATS[fmt]
+        name = f"{src.stem}.{width or 0}.{key}.{ext}"
+        etag = f'"{key}-{width or 0}-{fmt}"'
+
+        data = self._mem.get(name)
+        if data is not None:
+            metrics.cache_event("variants", "hit")
+            self._mem.move_to_end(name)
+            return data, etag
+        metrics.cache_event("variants", "miss")
+
+        # kilka równoczesnych żądań o ten sam wariant -> jeden render
+        fut = self._pending.get(name)
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            fut = loop.run_in_executor(self._executor, self._produce, name, src, width, fmt)
+            self._pending[name] = fut
+            fut.add_done_callback(lambda f, name=name: self._finish(name, f))
+        data = await asyncio.shield(fut)
+        return data, etag
+
+    def _finish(self, name: str, fut: asyncio.Future[bytes]) -> None:
+        self._pending.pop(name, None)
+        if not fut.cancelled() and fut.exception() is None:
+            self._remember(name, fut.result())
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, replace
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any
+
+from .responses import EncodedJSON
+from .utils import read_json, write_json_atomic
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+@dataclass(frozen=True)
+class CachedWeek:
+    payload: dict[str, Any]
+    encoded: EncodedJSON
+    fetched_at: float
+
+
+class WeekCache:
+    """Plany tygodni spoza bieżącego (/data/weeks/<poniedziałek>.json) + gotowe odpowiedzi."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._weeks: dict[date, CachedWeek] = {}
+        for p in self.directory.glob("*.json"):
+            try:
+                start = date.fromisoformat(p.stem)
+            except ValueError:
+                continue
+            payload = read_json(p)
+            if isinstance(payload, dict):
+                self._weeks[start] = CachedWeek(payload, EncodedJSON.encode(payload), p.stat().st_mtime)
+
+    def get(self, start: date) -> CachedWeek | None:
+        return self._weeks.get(start)
+
+    def all(self) -> list[CachedWeek]:
+        return list(self._weeks.values())
+
+    def age(self, start: date) -> float | None:
+        cached = self._weeks.get(start)
+        return None if cached is None else time.time() - cached.fetched_at
+
+    def put(self, start: date, payload: dict[str, Any]) -> bool:
+        cached = self._weeks.get(start)
+        if cached is not None and cached.payload.get("days") == payload.get("days"):
+            # bez zmian w planie: tylko odświeżony znacznik, bez zapisu i ponownego kodowania
+            self._weeks[start] = replace(cached, fetched_at=time.time())
+            return False
+        write_json_atomic(self.directory / f"{start.isoformat()}.json", payload)
+        self._weeks[start] = CachedWeek(payload, EncodedJSON.encode(payload), time.time())
+        return True
+
+    def prune(self, oldest: date) -> None:
+        for start in [s for s in self._weeks if s < oldest]:
+            del self._weeks[start]
+            (self.directory / f"{start.isoformat()}.json").unlink(missing_ok=True)
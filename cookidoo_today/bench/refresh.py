@@ -0,0 +1,189 @@
+"""Benchmark refresh_week() na lokalnym zamienniku Cookidoo.
+
+Uruchomienie (z katalogu cookidoo_today, z zainstalowanym app/requirements.txt):
+
+    python -m bench.refresh --recipes 28 --latency-ms 80 --runs 3
+
+Pierwszy przebieg startuje z pustym katalogiem danych (zimny cache), kolejne
+pokazują stan ustalony.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import aiohttp
+from yarl import URL
+
+from .stub import CookidooStub, StubConfig
+
+LOCAL_HOSTS = {"127.0.0.1", "localhost"}
+
+
+class RewritingSession:
+    """Opakowanie ClientSession: cały ruch (https://<host>/<ścieżka>) trafia do stuba
+    jako http://stub/<host>/<ścieżka>. Udostępnia to, czego używają add-on i cookidoo-api.
+    """
+
+    def __init__(self, stub_base: str, **kwargs: Any) -> None:
+        self._session = aiohttp.ClientSession(**kwargs)
+        self._stub_base = stub_base
+
+    def _rewrite(self, str_or_url: Any) -> URL:
+        url = URL(str_or_url)
+        if url.host in LOCAL_HOSTS:
+            return url
+        return URL(f"{self._stub_base}/{url.host}{url.raw_path_qs}", encoded=True)
+
+    def request(self, method: str, url: Any, **kwargs: Any) -> Any:
+        return self._session.request(method, self._rewrite(url), **kwargs)
+
+    def get(self, url: Any, **kwargs: Any) -> Any:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: Any, **kwargs: Any) -> Any:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: Any, **kwargs: Any) -> Any:
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url: Any, **kwargs: Any) -> Any:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: Any, **kwargs: Any) -> Any:
+        return self.request("DELETE", url, **kwargs)
+
+    @property
+    def closed(self) -> bool:
+        return self._session.closed
+
+    async def close(self) -> None:
+        await self._session.close()
+
+    def __getattr__(self, name: str) -> Any:
+        # pozostałe atrybuty (cookie_jar, headers, ...) bez zmian z prawdziwej sesji
+        return getattr(self._session, name)
+
+
+class CollageTimer:
+    def __init__(self) -> None:
+        self.cpu_s = 0.0
+        self.renders = 0
+        self._lock = threading.Lock()
+
+    def wrap(self, fn: Any) -> Any:
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            t0 = time.thread_time()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.cpu_s += time.thread_time() - t0
+                    self.renders += 1
+
+        return timed
+
+    def reset(self) -> None:
+        self.cpu_s = 0.0
+        self.renders = 0
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--recipes", type=int, default=14, help="liczba różnych przepisów w stubie")
+    p.add_argument("--per-day", type=int, default=2, help="przepisów na dzień w planie")
+    p.add_argument("--latency-ms", type=float, default=50.0, help="opóźnienie każdej odpowiedzi stuba")
+    p.add_argument("--image-size", default="1200x900", help="rozdzielczość zdjęć z CDN")
+    p.add_argument("--runs", type=int, default=3, help="liczba przebiegów (pierwszy na zimno)")
+    p.add_argument("--json", action="store_true", help="wynik jako JSON")
+    return p.parse_args(argv)
+
+
+async def run(args: argparse.Namespace, data_dir: Path) -> list[dict[str, Any]]:
+    # katalog danych musi być ustawiony przed importem serwera (stałe na poziomie modułu)
+    os.environ["COOKIDOO_DATA_DIR"] = str(data_dir)
+    (data_dir / "options.json").write_text(
+        json.dumps({"email": "bench@example.com", "password": "bench", "country": "pl"}),
+        encoding="utf-8",
+    )
+
+    from app import collage, server
+
+    timer = CollageTimer()
+    collage.make_collage = timer.wrap(collage.make_collage)
+
+    w, h = (int(x) for x in args.image_size.lower().split("x"))
+    stub = CookidooStub(
+        StubConfig(
+            recipes=args.recipes,
+            recipes_per_day=args.per_day,
+            latency_ms=args.latency_ms,
+            image_size=(w, h),
+        )
+    )
+    base = await stub.start()
+    server._client.session = RewritingSession(base)
+
+    results = []
+    try:
+        for i in range(args.runs):
+            stub.stats.reset()
+            timer.reset()
+            t0 = time.perf_counter()
+            data = await server.refresh_week()
+            changed = server.apply_state(data, server.today_slice(data))
+            wall = time.perf_counter() - t0
+            results.append(
+                {
+                    "run": i + 1,
+                    "cold": i == 0,
+                    "wall_s": round(wall, 4),
+                    "changed": changed,
+                    "requests": dict(stub.stats.requests),
+                    "statuses": dict(stub.stats.statuses),
+                    "bytes": dict(stub.stats.bytes_sent),
+                    "bytes_total": sum(stub.stats.bytes_sent.values()),
+                    "collage_cpu_s": round(timer.cpu_s, 4),
+                    "collages_rendered": timer.renders,
+                }
+            )
+    finally:
+        await server._client.close()
+        server._collages.shutdown()
+        server._variants.shutdown()
+        await stub.stop()
+    return results
+
+
+def print_table(results: list[dict[str, Any]]) -> None:
+    for r in results:
+        label = "zimny" if r["cold"] else "ciepły"
+        print(
+            f"run {r['run']} ({label}): {r['wall_s'] * 1000:.1f} ms, "
+            f"{sum(r['requests'].values())} żądań, {r['bytes_total'] / 1024:.1f} KiB, "
+            f"kolaże {r['collages_rendered']} / {r['collage_cpu_s'] * 1000:.1f} ms CPU"
+        )
+        for kind in sorted(r["requests"]):
+            print(f"    {kind:<14} {r['requests'][kind]:>4} żądań  {r['bytes'].get(kind, 0) / 1024:>9.1f} KiB")
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    with tempfile.TemporaryDirectory(prefix="cookidoo-bench-") as tmp:
+        results = asyncio.run(run(args, Path(tmp)))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
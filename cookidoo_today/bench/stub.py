@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any
+
+from aiohttp import web
+from PIL import Image
+
+IMAGE_HOST = "assets.tmecosys.com"
+
+
+@dataclass
+class StubConfig:
+    recipes: int = 14
+    recipes_per_day: int = 2
+    latency_ms: float = 50.0
+    image_size: tuple[int, int] = (1200, 900)
+    seed: int = 1
+
+
+@dataclass
+class StubStats:
+    requests: Counter = field(default_factory=Counter)
+    statuses: Counter = field(default_factory=Counter)
+    bytes_sent: Counter = field(default_factory=Counter)
+
+    def reset(self) -> None:
+        self.requests.clear()
+        self.statuses.clear()
+        self.bytes_sent.clear()
+
+
+def classify(method: str, path: str) -> str:
+    # ścieżka ma postać /<oryginalny host>/<oryginalna ścieżka>
+    host, _, rest = path.lstrip("/").partition("/")
+    if host == IMAGE_HOST:
+        return "image"
+    if method == "POST" and rest.endswith("/token"):
+        return "login"
+    if "/my-week/" in f"/{rest}":
+        return "calendar_week"
+    if rest.startswith("recipes/recipe/"):
+        return "recipe_page"
+    return "other"
+
+
+class CookidooStub:
+    """Lokalny zamiennik Cookidoo: token, plan tygodnia, strony przepisów i CDN obrazków.
+
+    Odpowiedzi naśladują kształt danych, który parsuje cookidoo-api 0.15.
+    """
+
+    def __init__(self, cfg: StubConfig) -> None:
+        self.cfg = cfg
+        self.stats = StubStats()
+        self.recipe_ids = [f"r{100000 + i}" for i in range(cfg.recipes)]
+        self._images: dict[str, bytes] = {}
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    def _image(self, rid: str) -> bytes:
+        data = self._images.get(rid)
+        if data is None:
+            rnd = random.Random(f"{self.cfg.seed}:{rid}")
+            color = tuple(rnd.randrange(256) for _ in range(3))
+            im = Image.new("RGB", self.cfg.image_size, color)
+            # trochę szumu, żeby rozmiar JPEG był zbliżony do prawdziwych zdjęć
+            noise = Image.effect_noise(self.cfg.image_size, 64).convert("RGB")
+            im = Image.blend(im, noise, 0.35)
+            buf = io.BytesIO()
+            im.save(buf, "JPEG", quality=88)
+            data = buf.getvalue()
+            self._images[rid] = data
+        return data
+
+    def _week_days(self, day: date) -> list[dict[str, Any]]:
+        monday = day - timedelta(days=day.weekday())
+        offset = (monday.toordinal() // 7) * self.cfg.recipes_per_day
+        days = []
+        for i in range(7):
+            d = monday + timedelta(days=i)
+            recipes = []
+            for j in range(self.cfg.recipes_per_day):
+                rid = self.recipe_ids[(offset + i * self.cfg.recipes_per_day + j) % len(self.recipe_ids)]
+                recipes.append(
+                    {
+                        "id": rid,
+                        "title": f"Przepis {rid}",
+                        "totalTime": 1800 + 300 * j,
+                        "assets": {"images": {"square": f"https://{IMAGE_HOST}/image/upload/{rid}.jpg"}},
+                        "url": f"/recipes/recipe/pl-PL/{rid}",
+                    }
+                )
+            days.append(
+                {
+                    "id": d.isoformat(),
+                    "title": d.isoformat(),
+                    "recipes": recipes,
+                    "customerRecipeIds": [],
+                    "dayKey": d.isoformat(),
+                }
+            )
+        return days
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler: Any) -> web.StreamResponse:
+        kind = classify(request.method, request.path)
+        self.stats.requests[kind] += 1
+        await asyncio.sleep(self.cfg.latency_ms / 1000)
+        try:
+            resp = await handler(request)
+        except web.HTTPException as e:
+            # odpowiedź zbuduje aiohttp; tu tylko odnotowujemy status
+            self.stats.statuses[f"{kind}:{e.status}"] += 1
+            raise
+        self.stats.statuses[f"{kind}:{resp.status}"] += 1
+        body = getattr(resp, "body", None)
+        if isinstance(body, (bytes, bytearray)):
+            self.stats.bytes_sent[kind] += len(body)
+        return resp
+
+    async def _token(self, request: web.Request) -> web.Response:
+        await request.read()
+        return web.json_response(
+            {
+                "access_token": "stub-access",
+                "refresh_token": "stub-refresh",
+                "token_type": "bearer",
+                "expires_in": 43200,
+                "sub": "stub-user",
+                "iat": 0,
+            }
+        )
+
+    async def _dispatch(self, request: web.Request) -> web.Response:
+        kind = classify(request.method, request.path)
+        if kind == "login":
+            return await self._token(request)
+
+        rest = request.path.lstrip("/").partition("/")[2]
+        if kind == "calendar_week":
+            day = date.fromisoformat(rest.rstrip("/").rsplit("/", 1)[-1][:10])
+            return web.json_response({"myDays": self._week_days(day)})
+
+        if kind == "recipe_page":
+            rid = rest.rstrip("/").rsplit("/", 1)[-1]
+            if rid not in self.recipe_ids:
+                raise web.HTTPNotFound()
+            etag = '"' + hashlib.sha1(rid.encode("utf-8")).hexdigest()[:16] + '"'
+            if request.headers.get("If-None-Match") == etag:
+                return web.Response(status=304, headers={"ETag": etag})
+            img = f"https://{IMAGE_HOST}/image/upload/t_web_rdp_recipe_584x480_1_5x/{rid}.jpg"
+            # prawdziwe strony mają setki KB markupu wokół adresu zdjęcia
+            html = f"<html><head></head><body>{'<div></div>' * 20000}<img src=\"{img}\"></body></html>"
+            return web.Response(text=html, content_type="text/html", headers={"ETag": etag})
+
+        if kind == "image":
+            rid = rest.rsplit("/", 1)[-1].removesuffix(".jpg")
+            if rid not in self.recipe_ids:
+                raise web.HTTPNotFound()
+            return web.Response(body=self._image(rid), content_type="image/jpeg")
+
+        raise web.HTTPNotFound()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_route("*", "/{tail:.*}", self._dispatch)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.base_url = f"http://{host}:{self._runner.addresses[0][1]}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
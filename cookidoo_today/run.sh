@@ -2,4 +2,6 @@
 
 bashio::log.info "Starting Cookidoo Today (FastAPI/Uvicorn) ..."
 
-exec python -m uvicorn app.server:app --host 0.0.0.0 --port 8099
\ No newline at end of file
+# otwarte strumienie SSE (/api/events) nigdy same się nie kończą - bez limitu
+# uvicorn czekałby na nie w nieskończoność przy zatrzymaniu add-ona
+exec python -m uvicorn app.server:app --host 0.0.0.0 --port 8099 --timeout-graceful-shutdown 5